@@ -4,21 +4,31 @@ Production-ready version with proper error handling and configuration
 """
 
 import os
+import json
+import queue
 import logging
+import threading
+from collections import OrderedDict
 from datetime import datetime, timedelta, date
 from io import BytesIO
-from functools import wraps
+from tempfile import SpooledTemporaryFile
+from functools import wraps, lru_cache
 
 from dotenv import load_dotenv
 load_dotenv()
 
-from flask import Flask, jsonify, request, send_file, render_template, g
+from flask import (Flask, Response, jsonify, request, send_file, render_template, g,
+                   current_app)
+from werkzeug.http import generate_etag
 import sqlite3
 
 from fpdf import FPDF
 from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-from openpyxl.utils import get_column_letter
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, PatternFill, Alignment, Border, Side, NamedStyle
+from openpyxl.styles.borders import DEFAULT_BORDER
+from openpyxl.styles.fonts import DEFAULT_FONT
+from openpyxl.worksheet.dimensions import ColumnDimension
 
 # =============================================================================
 # CONFIGURATION
@@ -28,6 +38,8 @@ class Config:
     """Application configuration"""
     SECRET_KEY = os.environ.get('SECRET_KEY', 'dev-secret-key-change-in-production')
     DATABASE = os.environ.get('DATABASE_PATH', 'schedule.db')
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', '8'))
+    SCHEDULE_CACHE_SIZE = int(os.environ.get('SCHEDULE_CACHE_SIZE', '64'))
     DEBUG = os.environ.get('FLASK_DEBUG', 'false').lower() == 'true'
     BACKUP_IMPORT_ENABLED = os.environ.get('BACKUP_IMPORT_ENABLED', 'false').lower() == 'true'
     
@@ -62,6 +74,10 @@ def create_app(config_class=Config):
                 template_folder='templates')
     
     app.config.from_object(config_class)
+    app.teardown_appcontext(close_db)
+    # Responses are consumed by our own JS, which never depends on key order;
+    # skip sorting every dict in every payload
+    app.json.sort_keys = False
     
     # Setup logging
     logging.basicConfig(
@@ -86,33 +102,93 @@ def create_app(config_class=Config):
 # DATABASE
 # =============================================================================
 
+# Per-process pool of open connections. Each gunicorn worker gets its own
+# (workers import the app after fork), so connections are never shared across
+# processes; check_same_thread=False lets a threaded worker hand a connection
+# to whichever request thread pops it next.
+_POOL = queue.LifoQueue(maxsize=Config.DB_POOL_SIZE)
+
+
+def _configure_conn(conn):
+    """Apply connection-level PRAGMAs; run once when a connection is opened"""
+    # WAL mode + busy_timeout: needed because we run 9 gunicorn workers,
+    # auto-save fires every 1.5s, and every save is a write transaction.
+    # WAL makes synchronous=NORMAL safe (no fsync per COMMIT, only at checkpoint).
+    if Config.DATABASE != ':memory:':
+        conn.execute('PRAGMA journal_mode = WAL')
+    conn.execute('PRAGMA synchronous = NORMAL')
+    conn.execute('PRAGMA busy_timeout = 5000')
+    conn.execute('PRAGMA foreign_keys = ON')
+    conn.execute('PRAGMA temp_store = MEMORY')
+    conn.execute('PRAGMA mmap_size = 268435456')  # 256 MB
+    conn.execute('PRAGMA cache_size = -20000')    # ~20 MB
+    return conn
+
+
+def _open_connection():
+    """Open and configure a new pooled database connection"""
+    # Pooled connections live for the whole process, so give each a statement
+    # cache large enough for every distinct SQL text the app issues
+    conn = sqlite3.connect(Config.DATABASE, timeout=5.0, check_same_thread=False,
+                           cached_statements=256)
+    conn.row_factory = sqlite3.Row
+    return _configure_conn(conn)
+
+
 def get_db():
     """Get database connection for current request"""
     if 'db' not in g:
-        g.db = sqlite3.connect(Config.DATABASE, timeout=5.0)
-        g.db.row_factory = sqlite3.Row
-        # WAL mode + busy_timeout: needed because we run 9 gunicorn workers,
-        # auto-save fires every 1.5s, and saves do delete-then-insert per week
-        g.db.execute('PRAGMA journal_mode = WAL')
-        g.db.execute('PRAGMA busy_timeout = 5000')
-        g.db.execute('PRAGMA foreign_keys = ON')
+        try:
+            g.db = _POOL.get_nowait()
+        except queue.Empty:
+            g.db = _open_connection()
     return g.db
 
 
 def close_db(e=None):
-    """Close database connection"""
+    """Return the request's connection to the pool (or close it if full)"""
     db = g.pop('db', None)
-    if db is not None:
+    if db is None:
+        return
+    # Never hand a half-finished transaction to the next request
+    if db.in_transaction:
+        db.rollback()
+    try:
+        _POOL.put_nowait(db)
+    except queue.Full:
         db.close()
 
 
+# Display order of schedule sections; materialized as employees.section_rank so
+# the schedule query can walk idx_employees_rank instead of sorting on a CASE
+SECTION_RANK_EXPR = "CASE section WHEN 'manager' THEN 1 WHEN 'zak' THEN 2 WHEN 'staff' THEN 3 END"
+
+
+# Tables that carried the old per-row data_generation triggers; init_db drops
+# them (the counter is now bumped once per write transaction, see bump_generation)
+LEGACY_GENERATION_TRIGGER_TABLES = (
+    'employees', 'schedules', 'shifts', 'office_hours', 'events', 'employee_notes'
+)
+
+
+# Stored in PRAGMA user_version once init_db has brought a database fully up
+# to date. Bump it whenever init_db gains a table, column, index or trigger.
+SCHEMA_VERSION = 2
+
+
 def init_db():
     """Initialize database schema and default data"""
-    conn = sqlite3.connect(Config.DATABASE)
+    conn = _configure_conn(sqlite3.connect(Config.DATABASE))
     cursor = conn.cursor()
+
+    # Already current: skip re-parsing all the DDL below on every worker start
+    cursor.execute('PRAGMA user_version')
+    if cursor.fetchone()[0] >= SCHEMA_VERSION:
+        conn.close()
+        return
     
     # Create tables
-    cursor.executescript('''
+    cursor.executescript(f'''
         CREATE TABLE IF NOT EXISTS employees (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             name TEXT NOT NULL,
@@ -121,7 +197,8 @@ def init_db():
             sort_order INTEGER DEFAULT 0,
             active INTEGER DEFAULT 1,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            section_rank INTEGER GENERATED ALWAYS AS ({SECTION_RANK_EXPR}) VIRTUAL
         );
         
         CREATE TABLE IF NOT EXISTS schedules (
@@ -175,13 +252,19 @@ def init_db():
             UNIQUE(employee_id, week_start)
         );
         
-        -- Indexes for performance
-        CREATE INDEX IF NOT EXISTS idx_shifts_schedule ON shifts(schedule_id);
-        CREATE INDEX IF NOT EXISTS idx_shifts_employee ON shifts(employee_id);
-        CREATE INDEX IF NOT EXISTS idx_schedules_week ON schedules(week_start);
-        CREATE INDEX IF NOT EXISTS idx_employees_active ON employees(active, section);
+        -- Single-row counter bumped once per write transaction (bump_generation)
+        CREATE TABLE IF NOT EXISTS data_generation (
+            id INTEGER PRIMARY KEY CHECK(id = 1),
+            generation INTEGER NOT NULL DEFAULT 0
+        );
+        INSERT OR IGNORE INTO data_generation (id, generation) VALUES (1, 0);
     ''')
 
+    # Everything below is one transaction. IMMEDIATE takes the write lock up
+    # front so gunicorn workers starting together run init one at a time
+    # (and can't both see an empty employees table and seed it twice).
+    cursor.execute('BEGIN IMMEDIATE')
+
     # Migrations: add columns to existing DBs that pre-date them
     cursor.execute("PRAGMA table_info(schedules)")
     schedule_cols = {row[1] for row in cursor.fetchall()}
@@ -189,6 +272,16 @@ def init_db():
         cursor.execute("ALTER TABLE schedules ADD COLUMN version INTEGER NOT NULL DEFAULT 1")
         logging.info("Migrated: added schedules.version column")
 
+    # table_xinfo (not table_info) is needed to see generated columns
+    cursor.execute("PRAGMA table_xinfo(employees)")
+    employee_cols = {row[1] for row in cursor.fetchall()}
+    if 'section_rank' not in employee_cols:
+        cursor.execute(
+            "ALTER TABLE employees ADD COLUMN section_rank INTEGER "
+            f"GENERATED ALWAYS AS ({SECTION_RANK_EXPR}) VIRTUAL"
+        )
+        logging.info("Migrated: added employees.section_rank column")
+
     # Seed default employees if table is empty
     cursor.execute('SELECT COUNT(*) FROM employees')
     if cursor.fetchone()[0] == 0:
@@ -198,29 +291,139 @@ def init_db():
         )
         logging.info("Initialized default employees")
 
+    # Indexes for performance (after the seed, so a fresh DB builds them once
+    # instead of maintaining them row by row)
+    for ddl in (
+        'CREATE INDEX IF NOT EXISTS idx_shifts_schedule ON shifts(schedule_id)',
+        'CREATE INDEX IF NOT EXISTS idx_shifts_employee ON shifts(employee_id)',
+        'CREATE INDEX IF NOT EXISTS idx_schedules_week ON schedules(week_start)',
+        # Supersedes idx_employees_active(active, section); also serves the
+        # ORDER BY of /api/employees
+        'DROP INDEX IF EXISTS idx_employees_active',
+        'CREATE INDEX IF NOT EXISTS idx_employees_section_sort ON employees(active, section, sort_order)',
+        'CREATE INDEX IF NOT EXISTS idx_events_schedule ON events(schedule_id, day_index)',
+        'CREATE INDEX IF NOT EXISTS idx_employees_rank ON employees(section_rank, sort_order)',
+        # Covering: the per-week notes lookup never touches the table
+        'CREATE INDEX IF NOT EXISTS idx_notes_week ON employee_notes(week_start, employee_id, note)',
+    ):
+        cursor.execute(ddl)
+
+    # Row-level triggers bumped data_generation once per row (and disabled the
+    # DELETE truncate optimization); writers now call bump_generation instead
+    for table in LEGACY_GENERATION_TRIGGER_TABLES:
+        for op in ('insert', 'update', 'delete'):
+            cursor.execute(f'DROP TRIGGER IF EXISTS trg_{table}_{op}_generation')
+
+    cursor.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
     conn.commit()
     conn.close()
 
 
+# Schedule sections an employee can belong to (mirrors the employees.section
+# CHECK constraint)
+EMPLOYEE_SECTIONS = frozenset(('manager', 'zak', 'staff'))
+
+# Employee fields the edit endpoint may change
+EMPLOYEE_UPDATE_FIELDS = ('name', 'phone', 'sort_order')
+
+# Employee columns returned by the API (excludes internal ones like section_rank)
+EMPLOYEE_API_COLUMNS = 'id, name, phone, section, sort_order, active, created_at, updated_at'
+
+# Tables included in the JSON backup, in restore (dependency) order
+BACKUP_TABLES = ('employees', 'schedules', 'shifts', 'office_hours', 'events', 'employee_notes')
+
+
+# Hot-path SQL. Kept as module constants so the text is byte-identical on every
+# call and each pooled connection's statement cache (keyed on SQL text) stays warm.
+SQL_DATA_GENERATION = 'SELECT generation FROM data_generation WHERE id = 1'
+
+SQL_BUMP_GENERATION = 'UPDATE data_generation SET generation = generation + 1 WHERE id = 1'
+
+SQL_SCHEDULE_BY_WEEK = 'SELECT id, week_start, week_title, version FROM schedules WHERE week_start = ?'
+
+SQL_INSERT_SCHEDULE = 'INSERT INTO schedules (week_start, week_title) VALUES (?, ?)'
+
+SQL_DELETE_SHIFT = 'DELETE FROM shifts WHERE schedule_id = ? AND employee_id = ? AND day_index = ?'
+
+SQL_UPSERT_SHIFT = '''
+    INSERT INTO shifts (schedule_id, employee_id, day_index, time_in, time_out)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT(schedule_id, employee_id, day_index)
+    DO UPDATE SET time_in = excluded.time_in, time_out = excluded.time_out
+'''
+
+# All seven default office_hours rows for a new week in one multi-row INSERT;
+# params are (schedule_id, open, close) repeated once per day
+SQL_INSERT_DEFAULT_OFFICE_HOURS = (
+    'INSERT INTO office_hours (schedule_id, day_index, time_in, time_out) VALUES '
+    + ', '.join(f'(?, {i}, ?, ?)' for i in range(7))
+)
+
+# Every employee, flagged if they have shifts on the given schedule
+SQL_SCHEDULE_EMPLOYEES = '''
+    SELECT id, name, phone, section, active,
+           id IN (SELECT employee_id FROM shifts WHERE schedule_id = ?) AS on_week
+    FROM employees
+    ORDER BY section_rank, sort_order
+'''
+
+# Shifts, office hours, events and notes for one week; `src` tags the table
+SQL_SCHEDULE_DETAILS = '''
+    SELECT 'shift' AS src, employee_id, day_index, time_in AS a, time_out AS b
+      FROM shifts WHERE schedule_id = ?
+    UNION ALL
+    SELECT 'hours', NULL, day_index, time_in, time_out
+      FROM office_hours WHERE schedule_id = ?
+    UNION ALL
+    SELECT 'event', NULL, day_index, event_text, NULL
+      FROM events WHERE schedule_id = ? AND event_text <> ''
+    UNION ALL
+    SELECT 'note', employee_id, NULL, note, NULL
+      FROM employee_notes WHERE week_start = ?
+'''
+
+
 # =============================================================================
 # HELPER FUNCTIONS
 # =============================================================================
 
+def parse_week_start(week_start_str):
+    """Parse a 'YYYY-MM-DD' week start string into a date"""
+    # date.fromisoformat is C-implemented and much cheaper than strptime, but
+    # on 3.11+ it also accepts forms like '20251229' or '2025-W01-1'; require
+    # the dashed layout so URLs keep mapping to one canonical week key
+    if len(week_start_str) != 10 or week_start_str[4] != '-' or week_start_str[7] != '-':
+        raise ValueError(f"Invalid week start '{week_start_str}', expected YYYY-MM-DD")
+    return date.fromisoformat(week_start_str)
+
+
+# (name, is_weekend) for each day of a Wed-Tues schedule week
+WEEK_DAYS = (
+    ('Wed', False), ('Thurs', False), ('Fri', False), ('Sat', True),
+    ('Sun', True), ('Mon', False), ('Tues', False),
+)
+
+
+@lru_cache(maxsize=256)
 def get_week_dates(week_start_str):
-    """Generate day info for the week starting from Wednesday"""
-    week_start = datetime.strptime(week_start_str, '%Y-%m-%d').date()
-    day_names = ['Wed', 'Thurs', 'Fri', 'Sat', 'Sun', 'Mon', 'Tues']
+    """Generate day info for the week starting from Wednesday.
+
+    Cached: returns a shared tuple, so callers must not mutate the day dicts.
+    """
+    week_start = parse_week_start(week_start_str)
     wed = week_start + timedelta(days=2)  # Monday + 2 = Wednesday
     
-    return [
-        {
+    ordinal = wed.toordinal()
+    days = []
+    for i, (name, is_weekend) in enumerate(WEEK_DAYS):
+        d = date.fromordinal(ordinal + i)
+        days.append({
             'name': name,
-            'date': f"{(wed + timedelta(days=i)).month}/{(wed + timedelta(days=i)).day}",
-            'fullDate': (wed + timedelta(days=i)).isoformat(),
-            'isWeekend': name in ['Sat', 'Sun']
-        }
-        for i, name in enumerate(day_names)
-    ]
+            'date': f"{d.month}/{d.day}",
+            'fullDate': d.isoformat(),
+            'isWeekend': is_weekend
+        })
+    return tuple(days)
 
 
 def parse_time_to_minutes(time_str):
@@ -243,71 +446,155 @@ def parse_time_to_minutes(time_str):
     return None
 
 
+MONTH_NAMES = ('January', 'February', 'March', 'April', 'May', 'June',
+               'July', 'August', 'September', 'October', 'November', 'December')
+
+# Ordinal suffix indexed by day of month (index 0 unused)
+DAY_SUFFIX = tuple(
+    'st' if d in (1, 21, 31) else
+    'nd' if d in (2, 22) else
+    'rd' if d in (3, 23) else
+    'th'
+    for d in range(32)
+)
+
+
+@lru_cache(maxsize=256)
 def format_week_title(wed_date):
     """Format week title like 'December 31st, 2025'"""
-    months = ['January', 'February', 'March', 'April', 'May', 'June',
-              'July', 'August', 'September', 'October', 'November', 'December']
-    
     day = wed_date.day
-    if day in [1, 21, 31]:
-        suffix = 'st'
-    elif day in [2, 22]:
-        suffix = 'nd'
-    elif day in [3, 23]:
-        suffix = 'rd'
-    else:
-        suffix = 'th'
-    
-    return f"{months[wed_date.month - 1]} {day}{suffix}, {wed_date.year}"
+    return f"{MONTH_NAMES[wed_date.month - 1]} {day}{DAY_SUFFIX[day]}, {wed_date.year}"
 
 
 def get_current_week_start():
     """Calculate the Monday of the current schedule week"""
     today = date.today()
-    weekday = today.weekday()  # 0=Mon, 1=Tue, 2=Wed, etc.
-    
-    # Schedule runs Wed-Tues
-    # If Mon(0) or Tue(1), we're still in the previous week's schedule
-    if weekday < 2:
-        days_back = 7 + weekday
-    else:
-        days_back = weekday
-    
-    monday = today - timedelta(days=days_back)
-    return monday.isoformat()
+    # Schedule runs Wed-Tues, keyed by the Monday before its Wednesday:
+    # (weekday - 2) % 7 is days since the week's Wednesday, + 2 back to Monday.
+    # Mon(0)/Tue(1) -> 7/8, i.e. still in the previous week's schedule.
+    days_back = (today.weekday() - 2) % 7 + 2
+    return (today - timedelta(days=days_back)).isoformat()
+
 
+def get_or_create_schedule(week_start_str, cursor=None):
+    """Get existing schedule or create new one.
 
-def get_or_create_schedule(week_start_str):
-    """Get existing schedule or create new one"""
+    Returns a mapping with only id, week_start, week_title and version.
+    Pass the caller's cursor to avoid allocating a second one per request.
+    """
     db = get_db()
-    cursor = db.cursor()
+    if cursor is None:
+        cursor = db.cursor()
     
-    cursor.execute('SELECT * FROM schedules WHERE week_start = ?', (week_start_str,))
+    cursor.execute(SQL_SCHEDULE_BY_WEEK, (week_start_str,))
     schedule = cursor.fetchone()
     
     if not schedule:
-        week_start = datetime.strptime(week_start_str, '%Y-%m-%d').date()
+        week_start = parse_week_start(week_start_str)
         wed = week_start + timedelta(days=2)
         week_title = format_week_title(wed)
         
-        cursor.execute(
-            'INSERT INTO schedules (week_start, week_title) VALUES (?, ?)',
-            (week_start_str, week_title)
-        )
+        cursor.execute(SQL_INSERT_SCHEDULE, (week_start_str, week_title))
         schedule_id = cursor.lastrowid
         
-        # Create default office hours
-        for i in range(7):
-            cursor.execute(
-                'INSERT INTO office_hours (schedule_id, day_index, time_in, time_out) VALUES (?, ?, ?, ?)',
-                (schedule_id, i, Config.DEFAULT_OFFICE_OPEN, Config.DEFAULT_OFFICE_CLOSE)
-            )
+        # Create default office hours (same transaction as the schedule row;
+        # sqlite3 opens it implicitly on the first INSERT)
+        cursor.execute(
+            SQL_INSERT_DEFAULT_OFFICE_HOURS,
+            (schedule_id, Config.DEFAULT_OFFICE_OPEN, Config.DEFAULT_OFFICE_CLOSE) * 7
+        )
         
+        bump_generation(cursor)
         db.commit()
-        cursor.execute('SELECT * FROM schedules WHERE id = ?', (schedule_id,))
-        schedule = cursor.fetchone()
+        # Everything callers read is already known; no need to re-SELECT the row
+        return {
+            'id': schedule_id,
+            'week_start': week_start_str,
+            'week_title': week_title,
+            'version': 1,
+        }
     
-    return dict(schedule)
+    return schedule
+
+
+def sync_shifts(cursor, schedule_id, shifts):
+    """Make the schedule's shifts match `shifts` (the full week from the client),
+    deleting dropped cells and upserting only new or changed ones"""
+    cursor.execute(
+        'SELECT employee_id, day_index, time_in, time_out FROM shifts WHERE schedule_id = ?',
+        (schedule_id,)
+    )
+    existing = {(row[0], row[1]): (row[2], row[3]) for row in cursor.fetchall()}
+    incoming = {
+        (shift['employee_id'], shift['day_index']): (shift.get('in'), shift.get('out'))
+        for shift in shifts
+        if shift.get('in') or shift.get('out')
+    }
+
+    cursor.executemany(
+        SQL_DELETE_SHIFT,
+        [(schedule_id, emp_id, day) for emp_id, day in existing.keys() - incoming.keys()]
+    )
+    cursor.executemany(
+        SQL_UPSERT_SHIFT,
+        [
+            (schedule_id, emp_id, day, time_in, time_out)
+            for (emp_id, day), (time_in, time_out) in incoming.items()
+            if existing.get((emp_id, day)) != (time_in, time_out)
+        ]
+    )
+
+
+def sync_office_hours(cursor, schedule_id, office_hours):
+    """Make the schedule's office hours match `office_hours` (one entry per day)"""
+    cursor.execute(
+        'SELECT day_index, time_in, time_out FROM office_hours WHERE schedule_id = ?',
+        (schedule_id,)
+    )
+    existing = {row[0]: (row[1], row[2]) for row in cursor.fetchall()}
+    incoming = {i: (oh.get('in'), oh.get('out')) for i, oh in enumerate(office_hours)}
+
+    cursor.executemany(
+        'DELETE FROM office_hours WHERE schedule_id = ? AND day_index = ?',
+        [(schedule_id, day) for day in existing.keys() - incoming.keys()]
+    )
+    cursor.executemany(
+        '''INSERT INTO office_hours (schedule_id, day_index, time_in, time_out)
+           VALUES (?, ?, ?, ?)
+           ON CONFLICT(schedule_id, day_index)
+           DO UPDATE SET time_in = excluded.time_in, time_out = excluded.time_out''',
+        [
+            (schedule_id, day, time_in, time_out)
+            for day, (time_in, time_out) in incoming.items()
+            if existing.get(day) != (time_in, time_out)
+        ]
+    )
+
+
+def sync_events(cursor, schedule_id, events):
+    """Make the schedule's events match `events` (a list of texts per day).
+
+    Events have no natural key to upsert on, so the week is only rewritten
+    when its list of events actually differs.
+    """
+    incoming = [
+        (i, event_text)
+        for i, day_events in enumerate(events)
+        for event_text in (day_events or ())
+        if event_text
+    ]
+    cursor.execute(
+        'SELECT day_index, event_text FROM events WHERE schedule_id = ? ORDER BY day_index, id',
+        (schedule_id,)
+    )
+    if [tuple(row) for row in cursor.fetchall()] == incoming:
+        return
+
+    cursor.execute('DELETE FROM events WHERE schedule_id = ?', (schedule_id,))
+    cursor.executemany(
+        'INSERT INTO events (schedule_id, day_index, event_text) VALUES (?, ?, ?)',
+        [(schedule_id, day, event_text) for day, event_text in incoming]
+    )
 
 
 def build_schedule_response(week_start_str):
@@ -315,73 +602,78 @@ def build_schedule_response(week_start_str):
     db = get_db()
     cursor = db.cursor()
     
-    schedule = get_or_create_schedule(week_start_str)
+    schedule = get_or_create_schedule(week_start_str, cursor)
     schedule_id = schedule['id']
 
-    # Show employees who are currently active OR who have shifts on this week
-    # (so past weeks still show seasonal staff who worked then, even after they're hidden)
-    cursor.execute('''
-        SELECT * FROM employees
-        WHERE active = 1
-           OR id IN (SELECT DISTINCT employee_id FROM shifts WHERE schedule_id = ?)
-        ORDER BY
-            CASE section WHEN 'manager' THEN 1 WHEN 'zak' THEN 2 WHEN 'staff' THEN 3 END,
-            sort_order
-    ''', (schedule_id,))
-    employees = [dict(row) for row in cursor.fetchall()]
-    
-    # Get shifts as lookup dictionary
-    cursor.execute('SELECT * FROM shifts WHERE schedule_id = ?', (schedule_id,))
-    shifts = {
-        (row['employee_id'], row['day_index']): {'in': row['time_in'], 'out': row['time_out']}
-        for row in cursor.fetchall()
-    }
-    
-    # Get office hours
-    cursor.execute('SELECT * FROM office_hours WHERE schedule_id = ? ORDER BY day_index', (schedule_id,))
-    oh_dict = {row['day_index']: row for row in cursor.fetchall()}
+    # The remaining reads return every row of the week; plain tuples skip
+    # building a sqlite3.Row per row
+    cursor.row_factory = None
+
+    # One pass over employees covers both lists: visible ones are active OR
+    # have shifts on this week (so past weeks still show seasonal staff who
+    # worked then, even after they're hidden); hidden ones are active = 0.
+    # Rows are (id, name, phone, section, active, on_week)
+    cursor.execute(SQL_SCHEDULE_EMPLOYEES, (schedule_id,))
+    all_employees = cursor.fetchall()
+    employees = [row for row in all_employees if row[4] == 1 or row[5]]
+    hidden_employees = sorted(
+        (
+            {'id': emp_id, 'name': name, 'phone': phone, 'section': section}
+            for emp_id, name, phone, section, active, _ in all_employees if active == 0
+        ),
+        key=lambda e: (e['section'], e['name'])
+    )
+
+    # Shifts, office hours, events and notes for the week in a single
+    # round-trip; `src` tags which table each row came from.
+    cursor.execute(SQL_SCHEDULE_DETAILS, (schedule_id, schedule_id, schedule_id, week_start_str))
+
+    # Seven day slots per visible employee, filled straight from the rows
+    shifts_by_emp = {emp[0]: [None] * 7 for emp in employees}
+    # Office hours / events are filled in place by day index, so these lists
+    # are the response values directly
     office_hours = [
-        {'in': oh_dict[i]['time_in'], 'out': oh_dict[i]['time_out']} if i in oh_dict
-        else {'in': Config.DEFAULT_OFFICE_OPEN, 'out': Config.DEFAULT_OFFICE_CLOSE}
-        for i in range(7)
+        {'in': Config.DEFAULT_OFFICE_OPEN, 'out': Config.DEFAULT_OFFICE_CLOSE} for _ in range(7)
     ]
-    
-    # Get events grouped by day
-    cursor.execute('SELECT * FROM events WHERE schedule_id = ?', (schedule_id,))
-    events_by_day = {i: [] for i in range(7)}
-    for row in cursor.fetchall():
-        if row['event_text']:
-            events_by_day[row['day_index']].append(row['event_text'])
-    
-    # Get employee notes for this week
-    cursor.execute(
-        'SELECT employee_id, note FROM employee_notes WHERE week_start = ?',
-        (week_start_str,)
-    )
-    notes = {row['employee_id']: row['note'] for row in cursor.fetchall()}
+    events_by_day = [[] for _ in range(7)]
+    notes = {}
+    for src, emp_id, day, a, b in cursor.fetchall():
+        if src == 'shift':
+            # .get: a shift committed between the two queries may belong to
+            # an employee the first query didn't return
+            slots = shifts_by_emp.get(emp_id)
+            if slots is not None:
+                slots[day] = {'in': a, 'out': b}
+        elif src == 'hours':
+            office_hours[day] = {'in': a, 'out': b}
+        elif src == 'event':
+            events_by_day[day].append(a)
+        else:
+            notes[emp_id] = a
     
     # Build employee data with shifts
     def build_employee(emp):
+        emp_id, name, phone, _, active, _ = emp
         return {
-            'id': emp['id'],
-            'name': emp['name'],
-            'phone': emp['phone'] or '',
-            'active': bool(emp['active']),
-            'shifts': [shifts.get((emp['id'], i)) for i in range(7)],
-            'note': notes.get(emp['id'], '')
+            'id': emp_id,
+            'name': name,
+            'phone': phone or '',
+            'active': bool(active),
+            'shifts': shifts_by_emp[emp_id],
+            'note': notes.get(emp_id, '')
         }
     
-    managers = [build_employee(e) for e in employees if e['section'] == 'manager']
-    zak_list = [e for e in employees if e['section'] == 'zak']
-    zak = build_employee(zak_list[0]) if zak_list else None
-    staff = [build_employee(e) for e in employees if e['section'] == 'staff']
-
-    cursor.execute('''
-        SELECT id, name, phone, section FROM employees
-        WHERE active = 0
-        ORDER BY section, name
-    ''')
-    hidden_employees = [dict(row) for row in cursor.fetchall()]
+    # Single pass; rows arrive grouped by section_rank. Only the first 'zak'
+    # employee is shown.
+    managers, staff, zak = [], [], None
+    for emp in employees:
+        section = emp[3]
+        if section == 'manager':
+            managers.append(build_employee(emp))
+        elif section == 'staff':
+            staff.append(build_employee(emp))
+        elif section == 'zak' and zak is None:
+            zak = build_employee(emp)
 
     return {
         'weekTitle': schedule['week_title'],
@@ -393,10 +685,335 @@ def build_schedule_response(week_start_str):
         'employees': staff,
         'hiddenEmployees': hidden_employees,
         'officeHours': office_hours,
-        'events': [events_by_day[i] for i in range(7)]
+        'events': events_by_day
     }
 
 
+def get_data_generation(db):
+    """Current value of the DB-wide write counter (see data_generation)"""
+    return db.execute(SQL_DATA_GENERATION).fetchone()[0]
+
+
+def bump_generation(cursor):
+    """Advance the DB-wide write counter. Every write transaction calls this
+    once, just before committing, so cached schedules and ETags from any
+    worker process go stale together with the data."""
+    cursor.execute(SQL_BUMP_GENERATION)
+
+
+# (week_start, data_generation) -> (generation, payload, json_body). Per
+# process; keying on the DB-wide generation counter keeps every worker
+# consistent without any cross-process invalidation.
+_SCHEDULE_CACHE = OrderedDict()
+_SCHEDULE_CACHE_LOCK = threading.Lock()
+
+
+def get_cached_schedule(week_start_str):
+    """Cached build_schedule_response as (generation, payload, json_body).
+
+    The payload is shared between requests, so callers must treat it as
+    read-only. json_body is the payload already serialized for the API.
+    """
+    db = get_db()
+    generation = get_data_generation(db)
+    key = (week_start_str, generation)
+
+    with _SCHEDULE_CACHE_LOCK:
+        entry = _SCHEDULE_CACHE.get(key)
+        if entry is not None:
+            _SCHEDULE_CACHE.move_to_end(key)
+            return entry
+
+    # Built outside the lock. If a write lands meanwhile, the payload is at
+    # least as new as the keyed generation, and later readers miss on the new key.
+    payload = build_schedule_response(week_start_str)
+    # Serialized once per generation; GETs send these bytes as-is
+    entry = (generation, payload, current_app.json.response(payload).get_data())
+
+    with _SCHEDULE_CACHE_LOCK:
+        _SCHEDULE_CACHE[key] = entry
+        while len(_SCHEDULE_CACHE) > Config.SCHEDULE_CACHE_SIZE:
+            _SCHEDULE_CACHE.popitem(last=False)
+    return entry
+
+
+def get_schedule_response(week_start_str):
+    """Cached schedule payload for a week (read-only; see get_cached_schedule)"""
+    return get_cached_schedule(week_start_str)[1]
+
+
+# =============================================================================
+# EXCEL EXPORT STYLES
+# =============================================================================
+
+# Built once and shared by every export; openpyxl style objects are immutable
+XLSX_YELLOW_FILL = PatternFill(start_color="FFFF00", end_color="FFFF00", fill_type="solid")
+XLSX_GREEN_FILL = PatternFill(start_color="92D050", end_color="92D050", fill_type="solid")
+XLSX_GRAY_FILL = PatternFill(start_color="D9D9D9", end_color="D9D9D9", fill_type="solid")
+
+XLSX_BOLD_FONT = Font(bold=True)
+XLSX_RED_BOLD_FONT = Font(bold=True, color="FF0000")
+XLSX_TITLE_FONT = Font(bold=True, size=14)
+
+_THIN_SIDE = Side(style='thin')
+XLSX_THIN_BORDER = Border(left=_THIN_SIDE, right=_THIN_SIDE, top=_THIN_SIDE, bottom=_THIN_SIDE)
+XLSX_CENTER = Alignment(horizontal='center', vertical='center')
+XLSX_LEFT = Alignment(horizontal='left', vertical='center')
+
+# One named style per visual variant. build_schedule_workbook registers these
+# on each workbook, so every cell is styled with a single assignment instead
+# of up to four separate attribute writes.
+XLSX_CELL_STYLES = {
+    'sched_title': {'font': XLSX_TITLE_FONT, 'alignment': XLSX_CENTER},
+    'sched_header': {'fill': XLSX_GRAY_FILL, 'alignment': XLSX_CENTER, 'border': XLSX_THIN_BORDER},
+    'sched_yellow_name': {'fill': XLSX_YELLOW_FILL, 'font': XLSX_BOLD_FONT,
+                          'alignment': XLSX_LEFT, 'border': XLSX_THIN_BORDER},
+    'sched_yellow_time': {'fill': XLSX_YELLOW_FILL, 'alignment': XLSX_CENTER, 'border': XLSX_THIN_BORDER},
+    'sched_green_name': {'fill': XLSX_GREEN_FILL, 'font': XLSX_BOLD_FONT,
+                         'alignment': XLSX_LEFT, 'border': XLSX_THIN_BORDER},
+    'sched_green_time': {'fill': XLSX_GREEN_FILL, 'alignment': XLSX_CENTER, 'border': XLSX_THIN_BORDER},
+    'sched_staff_name': {'alignment': XLSX_LEFT, 'border': XLSX_THIN_BORDER},
+    'sched_staff_time': {'alignment': XLSX_CENTER, 'border': XLSX_THIN_BORDER},
+    'sched_notice': {'fill': XLSX_GREEN_FILL, 'font': XLSX_RED_BOLD_FONT},
+    'sched_events_label': {'fill': XLSX_YELLOW_FILL, 'font': XLSX_BOLD_FONT},
+    'sched_events': {'alignment': XLSX_CENTER},
+}
+
+
+# =============================================================================
+# EXPORTS
+# =============================================================================
+
+# Exports larger than this are spooled to a temp file rather than kept in RAM
+EXPORT_SPOOL_MAX_BYTES = 2 * 1024 * 1024
+
+
+def build_schedule_workbook(data):
+    """Render a schedule payload as an .xlsx file (BytesIO, or a temp file if large)"""
+    # Write-only: rows are serialized as they're appended instead of
+    # being kept in an editable cell grid
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Schedule")
+    # Fall back to the workbook defaults (not NamedStyle's bare Font() and
+    # Border()) so unstyled attributes match a plain cell
+    defaults = {'font': DEFAULT_FONT, 'border': DEFAULT_BORDER}
+    for name, attrs in XLSX_CELL_STYLES.items():
+        wb.add_named_style(NamedStyle(name=name, **{**defaults, **attrs}))
+
+    def styled(value, style):
+        cell = WriteOnlyCell(ws, value=value)
+        cell.style = style
+        return cell
+
+    # Column widths (must be set before the first row is written)
+    ws.column_dimensions['A'].width = 35
+    # B:O as a single <col min="2" max="15"> entry instead of fourteen
+    ws.column_dimensions['B'] = ColumnDimension(ws, index='B', min=2, max=15, width=10)
+
+    # Title row
+    ws.merged_cells.add('A1:O1')
+    ws.append([styled(
+        f"Ice Line Office Schedule for week of {data['weekTitle']}", 'sched_title'
+    )])
+
+    # Day headers: both header rows built in one pass over the days
+    day_row = [None]
+    in_out_row = [None]
+    for day in data['days']:
+        day_row += [styled(day['name'], 'sched_header'), styled(day['date'], 'sched_header')]
+        in_out_row += [styled('In', 'sched_header'), styled('Out', 'sched_header')]
+    ws.append(day_row)
+    ws.append(in_out_row)
+
+    def write_employee_row(emp, variant):
+        name = emp['name'] + ('     ' + emp['phone'] if emp.get('phone') else '')
+        time_style = f'sched_{variant}_time'
+        row = [styled(name, f'sched_{variant}_name')]
+        append = row.append
+        for shift in emp['shifts']:
+            in_val, out_val = (shift['in'], shift['out']) if shift else ('', '')
+            append(styled(in_val, time_style))
+            append(styled(out_val, time_style))
+        ws.append(row)
+
+    # Managers
+    for emp in data['managers']:
+        write_employee_row(emp, 'yellow')
+
+    ws.append([])  # Empty row
+
+    # Zak
+    if data['zakReilly']:
+        write_employee_row(data['zakReilly'], 'green')
+
+    for _ in range(4):  # Empty rows
+        ws.append([])
+
+    # Staff
+    for emp in data['employees']:
+        write_employee_row(emp, 'staff')
+
+    # Office Hours
+    row = [styled('Front Office Hours*', 'sched_yellow_name')]
+    for oh in data['officeHours']:
+        for v in (oh['in'], oh['out']):
+            row.append(styled(v, 'sched_yellow_time'))
+    ws.append(row)
+
+    # Notice row
+    ws.append([
+        '* Hours are subject to change', None,
+        styled('IF UNABLE TO WORK A SCHEDULED SHIFT YOU MUST FIND A REPLACEMENT', 'sched_notice')
+    ])
+
+    # Events row
+    row = [styled('Special Events:', 'sched_events_label')]
+    for events in data['events']:
+        row += [styled(', '.join(events) if events else '', 'sched_events'), None]
+    ws.append(row)
+
+    # Save to a spooled buffer so large workbooks spill to disk instead of
+    # growing the worker's RSS. Small ones are handed back as a BytesIO:
+    # gunicorn's sendfile path calls fileno(), which would roll a
+    # SpooledTemporaryFile over to disk even when it fits in memory.
+    spool = SpooledTemporaryFile(max_size=EXPORT_SPOOL_MAX_BYTES)
+    wb.save(spool)
+    if spool.tell() <= EXPORT_SPOOL_MAX_BYTES:
+        spool.seek(0)
+        with spool:
+            return BytesIO(spool.read())
+    spool.seek(0)
+    return spool
+
+
+def build_schedule_pdf(data):
+    """Render a schedule payload as a PDF file in a BytesIO"""
+    pdf = FPDF(orientation='L', unit='mm', format='A4')
+    pdf.add_page()
+    pdf.set_auto_page_break(auto=True, margin=10)
+
+    # Title
+    pdf.set_font('Helvetica', 'B', 14)
+    pdf.cell(0, 10, f"Ice Line Office Schedule - Week of {data['weekTitle']}", ln=True, align='C')
+    pdf.ln(3)
+
+    # Table configuration
+    name_col_w = 50
+    day_col_w = 26
+    sub_col_w = 13
+    hours_col_w = 16
+    row_h = 7
+
+    # Day header row
+    pdf.set_font('Helvetica', 'B', 8)
+    pdf.set_fill_color(217, 217, 217)
+    pdf.cell(name_col_w, row_h, 'Employee', 1, 0, 'C', True)
+    for day in data['days']:
+        pdf.cell(day_col_w, row_h, f"{day['name']} {day['date']}", 1, 0, 'C', True)
+    pdf.cell(hours_col_w, row_h, 'Hours', 1, 1, 'C', True)
+
+    # In/Out sub-header
+    pdf.set_font('Helvetica', 'B', 7)
+    pdf.cell(name_col_w, row_h, '', 1, 0, 'C', True)
+    for _ in data['days']:
+        pdf.cell(sub_col_w, row_h, 'In', 1, 0, 'C', True)
+        pdf.cell(sub_col_w, row_h, 'Out', 1, 0, 'C', True)
+    pdf.cell(hours_col_w, row_h, '', 1, 1, 'C', True)
+
+    def write_employee_row(emp, fill_rgb=None):
+        pdf.set_font('Helvetica', 'B' if fill_rgb else '', 8)
+        if fill_rgb:
+            pdf.set_fill_color(*fill_rgb)
+
+        name = emp['name']
+        if emp.get('phone'):
+            name += f"  {emp['phone']}"
+        pdf.cell(name_col_w, row_h, name, 1, 0, 'L', bool(fill_rgb))
+
+        pdf.set_font('Helvetica', '', 8)
+        for shift in emp['shifts']:
+            in_val = shift['in'] if shift and shift.get('in') else ''
+            out_val = shift['out'] if shift and shift.get('out') else ''
+            pdf.cell(sub_col_w, row_h, str(in_val), 1, 0, 'C', bool(fill_rgb))
+            pdf.cell(sub_col_w, row_h, str(out_val), 1, 0, 'C', bool(fill_rgb))
+
+        # Calculate hours
+        total = 0
+        for shift in emp['shifts']:
+            if shift and shift.get('in') and shift.get('out'):
+                if shift['in'] == '-' or shift['out'] == '-':
+                    continue
+                in_mins = parse_time_to_minutes(shift['in'])
+                out_mins = parse_time_to_minutes(shift['out'])
+                if shift['out'] == 'CLOSE':
+                    out_mins = parse_time_to_minutes('10:00 PM')
+                if in_mins is not None and out_mins is not None and out_mins > in_mins:
+                    total += (out_mins - in_mins) / 60
+
+        hours_str = f"{total:.1f}" if total > 0 else '-'
+        pdf.set_font('Helvetica', 'B' if total > 40 else '', 8)
+        if total > 40:
+            pdf.set_text_color(255, 0, 0)
+        pdf.cell(hours_col_w, row_h, hours_str, 1, 1, 'C', bool(fill_rgb))
+        pdf.set_text_color(0, 0, 0)
+
+    # Managers (yellow)
+    for emp in data['managers']:
+        write_employee_row(emp, (255, 255, 0))
+
+    pdf.ln(2)
+
+    # Zak (green)
+    if data['zakReilly']:
+        write_employee_row(data['zakReilly'], (146, 208, 80))
+
+    pdf.ln(2)
+
+    # Staff (no fill)
+    for emp in data['employees']:
+        write_employee_row(emp)
+
+    pdf.ln(2)
+
+    # Office Hours row
+    pdf.set_font('Helvetica', 'B', 8)
+    pdf.set_fill_color(255, 255, 0)
+    pdf.cell(name_col_w, row_h, 'Front Office Hours*', 1, 0, 'L', True)
+    pdf.set_font('Helvetica', '', 8)
+    for oh in data['officeHours']:
+        in_val = oh.get('in', '') or ''
+        out_val = oh.get('out', '') or ''
+        if in_val == 'CLOSED':
+            pdf.cell(day_col_w, row_h, 'CLOSED', 1, 0, 'C', True)
+        else:
+            pdf.cell(sub_col_w, row_h, str(in_val), 1, 0, 'C', True)
+            pdf.cell(sub_col_w, row_h, str(out_val), 1, 0, 'C', True)
+    pdf.cell(hours_col_w, row_h, '', 1, 1, 'C', True)
+
+    # Notice
+    pdf.set_font('Helvetica', '', 7)
+    pdf.cell(name_col_w, row_h, '* Hours are subject to change', 0, 0, 'L')
+    pdf.set_font('Helvetica', 'B', 7)
+    pdf.set_text_color(255, 0, 0)
+    pdf.cell(0, row_h, 'IF UNABLE TO WORK A SCHEDULED SHIFT YOU MUST FIND A REPLACEMENT', 0, 1, 'C')
+    pdf.set_text_color(0, 0, 0)
+
+    # Events row
+    pdf.set_font('Helvetica', 'B', 8)
+    pdf.set_fill_color(255, 255, 0)
+    pdf.cell(name_col_w, row_h, 'Special Events:', 1, 0, 'L', True)
+    pdf.set_font('Helvetica', '', 8)
+    for events in data['events']:
+        event_text = ', '.join(events) if events else ''
+        pdf.cell(day_col_w, row_h, event_text, 1, 0, 'C', False)
+    pdf.cell(hours_col_w, row_h, '', 1, 1, 'C', False)
+
+    output = BytesIO()
+    pdf.output(output)
+    output.seek(0)
+    return output
+
+
 # =============================================================================
 # ERROR HANDLERS
 # =============================================================================
@@ -414,7 +1031,7 @@ def register_error_handlers(app):
     
     @app.errorhandler(500)
     def internal_error(e):
-        logging.error(f"Internal error: {e}")
+        logging.error("Internal error: %s", e)
         return jsonify({'error': 'Internal server error'}), 500
 
 
@@ -425,10 +1042,6 @@ def register_error_handlers(app):
 def register_routes(app):
     """Register all application routes"""
     
-    @app.teardown_appcontext
-    def teardown(exception):
-        close_db()
-    
     # CORS removed (April 2026): API_BASE is empty (same-origin); the wildcard
     # was exposing write endpoints to any browser tab. Add a narrow allowlist
     # here if a real cross-origin client ever needs access.
@@ -449,11 +1062,29 @@ def register_routes(app):
                 pass
         return str(latest)
 
+    # template -> (static_v, html, etag); only the latest asset version is kept
+    _page_cache = {}
+
+    def _render_page(template, static_v, **context):
+        """render_template, memoized per static version and revalidated by ETag.
+
+        Only for pages whose output depends on nothing but static_v and config.
+        """
+        cached = _page_cache.get(template)
+        if cached is None or cached[0] != static_v:
+            html = render_template(template, static_v=static_v, **context)
+            cached = _page_cache[template] = (static_v, html, generate_etag(html.encode()))
+
+        response = app.make_response(cached[1])
+        response.set_etag(cached[2])
+        response.headers['Cache-Control'] = 'no-cache'
+        return response.make_conditional(request)
+
     @app.route('/')
     def index():
-        return render_template(
+        return _render_page(
             'index.html',
-            static_v=_static_version('js/main.js', 'css/main.css'),
+            _static_version('js/main.js', 'css/main.css'),
             backup_import_enabled=Config.BACKUP_IMPORT_ENABLED,
         )
 
@@ -461,9 +1092,9 @@ def register_routes(app):
     @app.route('/employee/')
     def employee_portal():
         """Employee portal - read-only schedule view"""
-        return render_template(
+        return _render_page(
             'employee_portal.html',
-            static_v=_static_version('js/employee_portal.js', 'css/employee_portal.css'),
+            _static_version('js/employee_portal.js', 'css/employee_portal.css'),
         )
     
     # -------------------------------------------------------------------------
@@ -474,20 +1105,31 @@ def register_routes(app):
     def get_current_week():
         """Get the current schedule week start date"""
         today = date.today()
-        return jsonify({
+        response = jsonify({
             'weekStart': get_current_week_start(),
             'today': today.isoformat(),
             'todayName': today.strftime('%A')
         })
+        # Body only changes once a day; repeat polls get a bodiless 304
+        response.add_etag()
+        response.headers['Cache-Control'] = 'no-cache'
+        return response.make_conditional(request)
     
     @app.route('/api/schedule/<week_start>', methods=['GET'])
     def get_schedule(week_start):
         """Get schedule for a specific week"""
         try:
-            return jsonify(build_schedule_response(week_start))
+            generation, _, body = get_cached_schedule(week_start)
         except Exception as e:
-            logging.error(f"Error getting schedule: {e}")
+            logging.error("Error getting schedule: %s", e)
             return jsonify({'error': str(e)}), 400
+
+        # Same generation-based ETag scheme as /api/employees; an unchanged
+        # week revalidates to a bodiless 304
+        response = app.response_class(body, mimetype=app.json.mimetype)
+        response.set_etag(f"schedule-{week_start}-{generation}")
+        response.headers['Cache-Control'] = 'no-cache'
+        return response.make_conditional(request)
     
     @app.route('/api/schedule/<week_start>', methods=['POST'])
     def save_schedule(week_start):
@@ -507,6 +1149,10 @@ def register_routes(app):
             db = get_db()
             cursor = db.cursor()
 
+            # Take the write lock up front so the version check and the
+            # rewrites below commit as one unit
+            cursor.execute('BEGIN IMMEDIATE')
+
             # Optimistic concurrency: atomic version bump. If base_version
             # doesn't match current, this UPDATE affects 0 rows -> conflict.
             # base_version may be None for legacy clients during the rollout
@@ -534,46 +1180,20 @@ def register_routes(app):
                        WHERE id = ?''',
                     (schedule_id,)
                 )
-                logging.warning(f"save_schedule: legacy client (no base_version) for week {week_start}")
+                logging.warning("save_schedule: legacy client (no base_version) for week %s", week_start)
 
-            # Update shifts
+            # Write only what changed: unchanged rows are left alone, so a
+            # save that touches one cell writes one row instead of the week
             if 'shifts' in data:
-                cursor.execute('DELETE FROM shifts WHERE schedule_id = ?', (schedule_id,))
-                for shift in data['shifts']:
-                    if shift.get('in') or shift.get('out'):
-                        cursor.execute(
-                            '''INSERT INTO shifts
-                               (schedule_id, employee_id, day_index, time_in, time_out)
-                               VALUES (?, ?, ?, ?, ?)''',
-                            (schedule_id, shift['employee_id'], shift['day_index'],
-                             shift.get('in'), shift.get('out'))
-                        )
-
-            # Update office hours
+                sync_shifts(cursor, schedule_id, data['shifts'])
+
             if 'officeHours' in data:
-                cursor.execute('DELETE FROM office_hours WHERE schedule_id = ?', (schedule_id,))
-                for i, oh in enumerate(data['officeHours']):
-                    cursor.execute(
-                        '''INSERT INTO office_hours
-                           (schedule_id, day_index, time_in, time_out)
-                           VALUES (?, ?, ?, ?)''',
-                        (schedule_id, i, oh.get('in'), oh.get('out'))
-                    )
-
-            # Update events
+                sync_office_hours(cursor, schedule_id, data['officeHours'])
+
             if 'events' in data:
-                cursor.execute('DELETE FROM events WHERE schedule_id = ?', (schedule_id,))
-                for i, day_events in enumerate(data['events']):
-                    if day_events:
-                        for event_text in day_events:
-                            if event_text:
-                                cursor.execute(
-                                    '''INSERT INTO events
-                                       (schedule_id, day_index, event_text)
-                                       VALUES (?, ?, ?)''',
-                                    (schedule_id, i, event_text)
-                                )
+                sync_events(cursor, schedule_id, data['events'])
 
+            bump_generation(cursor)
             db.commit()
 
             cursor.execute('SELECT version FROM schedules WHERE id = ?', (schedule_id,))
@@ -582,8 +1202,7 @@ def register_routes(app):
         
         except Exception as e:
             import traceback
-            logging.error(f"Error saving schedule: {e}")
-            logging.error(traceback.format_exc())
+            logging.exception("Error saving schedule: %s", e)
             return jsonify({'error': str(e), 'traceback': traceback.format_exc()}), 400
     
     @app.route('/api/schedule/<week_start>/shift', methods=['POST'])
@@ -596,28 +1215,20 @@ def register_routes(app):
             db = get_db()
             cursor = db.cursor()
             
-            # Delete existing shift
-            cursor.execute(
-                '''DELETE FROM shifts 
-                   WHERE schedule_id = ? AND employee_id = ? AND day_index = ?''',
-                (schedule['id'], data['employee_id'], data['day_index'])
-            )
+            key = (schedule['id'], data['employee_id'], data['day_index'])
             
-            # Insert new shift if values provided
+            # One statement either way: upsert the cell, or clear it if empty
             if data.get('in') or data.get('out'):
-                cursor.execute(
-                    '''INSERT INTO shifts 
-                       (schedule_id, employee_id, day_index, time_in, time_out) 
-                       VALUES (?, ?, ?, ?, ?)''',
-                    (schedule['id'], data['employee_id'], data['day_index'],
-                     data.get('in'), data.get('out'))
-                )
+                cursor.execute(SQL_UPSERT_SHIFT, key + (data.get('in'), data.get('out')))
+            else:
+                cursor.execute(SQL_DELETE_SHIFT, key)
             
+            bump_generation(cursor)
             db.commit()
             return jsonify({'success': True})
         
         except Exception as e:
-            logging.error(f"Error updating shift: {e}")
+            logging.error("Error updating shift: %s", e)
             return jsonify({'error': str(e)}), 400
     
     # -------------------------------------------------------------------------
@@ -628,13 +1239,22 @@ def register_routes(app):
     def get_employees():
         """Get all active employees"""
         db = get_db()
-        cursor = db.cursor()
-        cursor.execute(
-            '''SELECT * FROM employees 
-               WHERE active = 1 
-               ORDER BY section, sort_order'''
-        )
-        return jsonify([dict(row) for row in cursor.fetchall()])
+        # The ETag follows the DB-wide write generation, so a revalidation
+        # that still matches is answered without querying employees at all
+        etag = f"employees-{get_data_generation(db)}"
+        if request.if_none_match.contains(etag):
+            response = app.response_class(status=304)
+        else:
+            cursor = db.cursor()
+            cursor.execute(
+                f'''SELECT {EMPLOYEE_API_COLUMNS} FROM employees 
+                    WHERE active = 1 
+                    ORDER BY section, sort_order'''
+            )
+            response = jsonify([dict(row) for row in cursor.fetchall()])
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
     
     @app.route('/api/employees', methods=['POST'])
     def add_employee():
@@ -646,34 +1266,29 @@ def register_routes(app):
                 return jsonify({'error': 'Name is required'}), 400
             
             section = data.get('section', 'staff')
-            if section not in ('manager', 'zak', 'staff'):
+            if section not in EMPLOYEE_SECTIONS:
                 return jsonify({'error': 'Invalid section'}), 400
             
             db = get_db()
             cursor = db.cursor()
             
-            # Get next sort order
-            cursor.execute(
-                'SELECT COALESCE(MAX(sort_order), 0) + 1 FROM employees WHERE section = ?',
-                (section,)
-            )
-            next_order = cursor.fetchone()[0]
-            
+            # Next sort order is computed inside the INSERT, so it is atomic
+            # with the insert; RETURNING hands back the new row
             cursor.execute(
-                '''INSERT INTO employees (name, phone, section, sort_order) 
-                   VALUES (?, ?, ?, ?)''',
-                (data['name'], data.get('phone', ''), section, next_order)
+                f'''INSERT INTO employees (name, phone, section, sort_order) 
+                    VALUES (?, ?, ?, (SELECT COALESCE(MAX(sort_order), 0) + 1
+                                      FROM employees WHERE section = ?))
+                    RETURNING {EMPLOYEE_API_COLUMNS}''',
+                (data['name'], data.get('phone', ''), section, section)
             )
-            
-            emp_id = cursor.lastrowid
-            cursor.execute('SELECT * FROM employees WHERE id = ?', (emp_id,))
             employee = dict(cursor.fetchone())
             
+            bump_generation(cursor)
             db.commit()
             return jsonify(employee), 201
         
         except Exception as e:
-            logging.error(f"Error adding employee: {e}")
+            logging.error("Error adding employee: %s", e)
             return jsonify({'error': str(e)}), 400
     
     @app.route('/api/employees/<int:emp_id>', methods=['PUT'])
@@ -684,34 +1299,35 @@ def register_routes(app):
             db = get_db()
             cursor = db.cursor()
             
-            # Build update query dynamically
-            updates = []
-            values = []
-            
-            for field in ['name', 'phone', 'sort_order']:
-                if field in data:
-                    updates.append(f'{field} = ?')
-                    values.append(data[field])
-            
-            if updates:
-                updates.append('updated_at = CURRENT_TIMESTAMP')
-                values.append(emp_id)
+            # One fixed statement (stays in the statement cache); fields that
+            # are missing or null keep their current value
+            changed = any(data.get(field) is not None for field in EMPLOYEE_UPDATE_FIELDS)
+            if changed:
                 cursor.execute(
-                    f'UPDATE employees SET {", ".join(updates)} WHERE id = ?',
-                    values
+                    f'''UPDATE employees
+                        SET name = COALESCE(?, name),
+                            phone = COALESCE(?, phone),
+                            sort_order = COALESCE(?, sort_order),
+                            updated_at = CURRENT_TIMESTAMP
+                        WHERE id = ?
+                        RETURNING {EMPLOYEE_API_COLUMNS}''',
+                    (data.get('name'), data.get('phone'), data.get('sort_order'), emp_id)
                 )
-            
-            cursor.execute('SELECT * FROM employees WHERE id = ?', (emp_id,))
+            else:
+                cursor.execute(f'SELECT {EMPLOYEE_API_COLUMNS} FROM employees WHERE id = ?', (emp_id,))
             row = cursor.fetchone()
             
             if not row:
                 return jsonify({'error': 'Employee not found'}), 404
             
+            employee = dict(row)
+            if changed:
+                bump_generation(cursor)
             db.commit()
-            return jsonify(dict(row))
+            return jsonify(employee)
         
         except Exception as e:
-            logging.error(f"Error updating employee: {e}")
+            logging.error("Error updating employee: %s", e)
             return jsonify({'error': str(e)}), 400
     
     @app.route('/api/employees/<int:emp_id>', methods=['DELETE'])
@@ -725,11 +1341,12 @@ def register_routes(app):
                 'UPDATE employees SET active = 0, updated_at = CURRENT_TIMESTAMP WHERE id = ?',
                 (emp_id,)
             )
+            bump_generation(cursor)
             db.commit()
             return jsonify({'success': True})
 
         except Exception as e:
-            logging.error(f"Error hiding employee: {e}")
+            logging.error("Error hiding employee: %s", e)
             return jsonify({'error': str(e)}), 400
 
     @app.route('/api/employees/<int:emp_id>/restore', methods=['POST'])
@@ -739,18 +1356,21 @@ def register_routes(app):
             db = get_db()
             cursor = db.cursor()
             cursor.execute(
-                'UPDATE employees SET active = 1, updated_at = CURRENT_TIMESTAMP WHERE id = ?',
+                f'''UPDATE employees SET active = 1, updated_at = CURRENT_TIMESTAMP
+                    WHERE id = ?
+                    RETURNING {EMPLOYEE_API_COLUMNS}''',
                 (emp_id,)
             )
-            cursor.execute('SELECT * FROM employees WHERE id = ?', (emp_id,))
             row = cursor.fetchone()
             if not row:
                 return jsonify({'error': 'Employee not found'}), 404
+            employee = dict(row)
+            bump_generation(cursor)
             db.commit()
-            return jsonify(dict(row))
+            return jsonify(employee)
 
         except Exception as e:
-            logging.error(f"Error restoring employee: {e}")
+            logging.error("Error restoring employee: %s", e)
             return jsonify({'error': str(e)}), 400
     
     # -------------------------------------------------------------------------
@@ -793,11 +1413,12 @@ def register_routes(app):
                     (emp_id, week_start)
                 )
             
+            bump_generation(cursor)
             db.commit()
             return jsonify({'success': True})
         
         except Exception as e:
-            logging.error(f"Error saving note: {e}")
+            logging.error("Error saving note: %s", e)
             return jsonify({'error': str(e)}), 400
     
     # -------------------------------------------------------------------------
@@ -808,131 +1429,9 @@ def register_routes(app):
     def export_schedule(week_start):
         """Export schedule to Excel with formatting"""
         try:
-            data = build_schedule_response(week_start)
-            
-            wb = Workbook()
-            ws = wb.active
-            ws.title = "Schedule"
-            
-            # Styles
-            yellow_fill = PatternFill(start_color="FFFF00", end_color="FFFF00", fill_type="solid")
-            green_fill = PatternFill(start_color="92D050", end_color="92D050", fill_type="solid")
-            gray_fill = PatternFill(start_color="D9D9D9", end_color="D9D9D9", fill_type="solid")
-            
-            bold_font = Font(bold=True)
-            red_bold_font = Font(bold=True, color="FF0000")
-            title_font = Font(bold=True, size=14)
-            
-            thin_border = Border(
-                left=Side(style='thin'), right=Side(style='thin'),
-                top=Side(style='thin'), bottom=Side(style='thin')
-            )
-            center_align = Alignment(horizontal='center', vertical='center')
-            left_align = Alignment(horizontal='left', vertical='center')
-            
-            # Title row
-            ws.merge_cells('A1:O1')
-            ws['A1'] = f"Ice Line Office Schedule for week of {data['weekTitle']}"
-            ws['A1'].font = title_font
-            ws['A1'].alignment = center_align
-            
-            # Day headers
-            col = 2
-            for day in data['days']:
-                for r in [2, 3]:
-                    for c in [col, col + 1]:
-                        ws.cell(row=r, column=c).fill = gray_fill
-                        ws.cell(row=r, column=c).alignment = center_align
-                        ws.cell(row=r, column=c).border = thin_border
-                ws.cell(row=2, column=col, value=day['name'])
-                ws.cell(row=2, column=col + 1, value=day['date'])
-                ws.cell(row=3, column=col, value='In')
-                ws.cell(row=3, column=col + 1, value='Out')
-                col += 2
-            
-            current_row = 4
+            data = get_schedule_response(week_start)
             
-            def write_employee_row(emp, row, fill=None):
-                name = emp['name'] + ('     ' + emp['phone'] if emp.get('phone') else '')
-                ws.cell(row=row, column=1, value=name).alignment = left_align
-                ws.cell(row=row, column=1).border = thin_border
-                if fill:
-                    ws.cell(row=row, column=1).fill = fill
-                    ws.cell(row=row, column=1).font = bold_font
-                
-                col = 2
-                for shift in emp['shifts']:
-                    in_val = shift['in'] if shift else ''
-                    out_val = shift['out'] if shift else ''
-                    for c, v in [(col, in_val), (col + 1, out_val)]:
-                        ws.cell(row=row, column=c, value=v).alignment = center_align
-                        ws.cell(row=row, column=c).border = thin_border
-                        if fill:
-                            ws.cell(row=row, column=c).fill = fill
-                    col += 2
-            
-            # Managers
-            for emp in data['managers']:
-                write_employee_row(emp, current_row, yellow_fill)
-                current_row += 1
-            
-            current_row += 1  # Empty row
-            
-            # Zak
-            if data['zakReilly']:
-                write_employee_row(data['zakReilly'], current_row, green_fill)
-                current_row += 1
-            
-            current_row += 4  # Empty rows
-            
-            # Staff
-            for emp in data['employees']:
-                write_employee_row(emp, current_row, None)
-                current_row += 1
-            
-            # Office Hours
-            ws.cell(row=current_row, column=1, value='Front Office Hours*')
-            ws.cell(row=current_row, column=1).fill = yellow_fill
-            ws.cell(row=current_row, column=1).font = bold_font
-            ws.cell(row=current_row, column=1).alignment = left_align
-            ws.cell(row=current_row, column=1).border = thin_border
-            
-            col = 2
-            for oh in data['officeHours']:
-                for c, v in [(col, oh['in']), (col + 1, oh['out'])]:
-                    ws.cell(row=current_row, column=c, value=v).fill = yellow_fill
-                    ws.cell(row=current_row, column=c).alignment = center_align
-                    ws.cell(row=current_row, column=c).border = thin_border
-                col += 2
-            current_row += 1
-            
-            # Notice row
-            ws.cell(row=current_row, column=1, value='* Hours are subject to change')
-            ws.cell(row=current_row, column=3, 
-                    value='IF UNABLE TO WORK A SCHEDULED SHIFT YOU MUST FIND A REPLACEMENT')
-            ws.cell(row=current_row, column=3).fill = green_fill
-            ws.cell(row=current_row, column=3).font = red_bold_font
-            current_row += 1
-            
-            # Events row
-            ws.cell(row=current_row, column=1, value='Special Events:')
-            ws.cell(row=current_row, column=1).fill = yellow_fill
-            ws.cell(row=current_row, column=1).font = bold_font
-            col = 2
-            for events in data['events']:
-                ws.cell(row=current_row, column=col, 
-                        value=', '.join(events) if events else '').alignment = center_align
-                col += 2
-            
-            # Column widths
-            ws.column_dimensions['A'].width = 35
-            for c in range(2, 16):
-                ws.column_dimensions[get_column_letter(c)].width = 10
-            
-            # Save to buffer
-            output = BytesIO()
-            wb.save(output)
-            output.seek(0)
+            output = build_schedule_workbook(data)
             
             # Generate filename
             d1 = data['days'][0]['date'].replace('/', '-')
@@ -948,7 +1447,7 @@ def register_routes(app):
             )
         
         except Exception as e:
-            logging.error(f"Error exporting schedule: {e}")
+            logging.error("Error exporting schedule: %s", e)
             return jsonify({'error': str(e)}), 400
 
     # -------------------------------------------------------------------------
@@ -959,127 +1458,9 @@ def register_routes(app):
     def export_schedule_pdf(week_start):
         """Export schedule to PDF with formatting"""
         try:
-            data = build_schedule_response(week_start)
-
-            pdf = FPDF(orientation='L', unit='mm', format='A4')
-            pdf.add_page()
-            pdf.set_auto_page_break(auto=True, margin=10)
-
-            # Title
-            pdf.set_font('Helvetica', 'B', 14)
-            pdf.cell(0, 10, f"Ice Line Office Schedule - Week of {data['weekTitle']}", ln=True, align='C')
-            pdf.ln(3)
-
-            # Table configuration
-            name_col_w = 50
-            day_col_w = 26
-            sub_col_w = 13
-            hours_col_w = 16
-            row_h = 7
-
-            # Day header row
-            pdf.set_font('Helvetica', 'B', 8)
-            pdf.set_fill_color(217, 217, 217)
-            pdf.cell(name_col_w, row_h, 'Employee', 1, 0, 'C', True)
-            for day in data['days']:
-                pdf.cell(day_col_w, row_h, f"{day['name']} {day['date']}", 1, 0, 'C', True)
-            pdf.cell(hours_col_w, row_h, 'Hours', 1, 1, 'C', True)
-
-            # In/Out sub-header
-            pdf.set_font('Helvetica', 'B', 7)
-            pdf.cell(name_col_w, row_h, '', 1, 0, 'C', True)
-            for _ in data['days']:
-                pdf.cell(sub_col_w, row_h, 'In', 1, 0, 'C', True)
-                pdf.cell(sub_col_w, row_h, 'Out', 1, 0, 'C', True)
-            pdf.cell(hours_col_w, row_h, '', 1, 1, 'C', True)
-
-            def write_employee_row(emp, fill_rgb=None):
-                pdf.set_font('Helvetica', 'B' if fill_rgb else '', 8)
-                if fill_rgb:
-                    pdf.set_fill_color(*fill_rgb)
-
-                name = emp['name']
-                if emp.get('phone'):
-                    name += f"  {emp['phone']}"
-                pdf.cell(name_col_w, row_h, name, 1, 0, 'L', bool(fill_rgb))
-
-                pdf.set_font('Helvetica', '', 8)
-                for shift in emp['shifts']:
-                    in_val = shift['in'] if shift and shift.get('in') else ''
-                    out_val = shift['out'] if shift and shift.get('out') else ''
-                    pdf.cell(sub_col_w, row_h, str(in_val), 1, 0, 'C', bool(fill_rgb))
-                    pdf.cell(sub_col_w, row_h, str(out_val), 1, 0, 'C', bool(fill_rgb))
-
-                # Calculate hours
-                total = 0
-                for shift in emp['shifts']:
-                    if shift and shift.get('in') and shift.get('out'):
-                        if shift['in'] == '-' or shift['out'] == '-':
-                            continue
-                        in_mins = parse_time_to_minutes(shift['in'])
-                        out_mins = parse_time_to_minutes(shift['out'])
-                        if shift['out'] == 'CLOSE':
-                            out_mins = parse_time_to_minutes('10:00 PM')
-                        if in_mins is not None and out_mins is not None and out_mins > in_mins:
-                            total += (out_mins - in_mins) / 60
-
-                hours_str = f"{total:.1f}" if total > 0 else '-'
-                pdf.set_font('Helvetica', 'B' if total > 40 else '', 8)
-                if total > 40:
-                    pdf.set_text_color(255, 0, 0)
-                pdf.cell(hours_col_w, row_h, hours_str, 1, 1, 'C', bool(fill_rgb))
-                pdf.set_text_color(0, 0, 0)
-
-            # Managers (yellow)
-            for emp in data['managers']:
-                write_employee_row(emp, (255, 255, 0))
-
-            pdf.ln(2)
-
-            # Zak (green)
-            if data['zakReilly']:
-                write_employee_row(data['zakReilly'], (146, 208, 80))
-
-            pdf.ln(2)
-
-            # Staff (no fill)
-            for emp in data['employees']:
-                write_employee_row(emp)
-
-            pdf.ln(2)
-
-            # Office Hours row
-            pdf.set_font('Helvetica', 'B', 8)
-            pdf.set_fill_color(255, 255, 0)
-            pdf.cell(name_col_w, row_h, 'Front Office Hours*', 1, 0, 'L', True)
-            pdf.set_font('Helvetica', '', 8)
-            for oh in data['officeHours']:
-                in_val = oh.get('in', '') or ''
-                out_val = oh.get('out', '') or ''
-                if in_val == 'CLOSED':
-                    pdf.cell(day_col_w, row_h, 'CLOSED', 1, 0, 'C', True)
-                else:
-                    pdf.cell(sub_col_w, row_h, str(in_val), 1, 0, 'C', True)
-                    pdf.cell(sub_col_w, row_h, str(out_val), 1, 0, 'C', True)
-            pdf.cell(hours_col_w, row_h, '', 1, 1, 'C', True)
-
-            # Notice
-            pdf.set_font('Helvetica', '', 7)
-            pdf.cell(name_col_w, row_h, '* Hours are subject to change', 0, 0, 'L')
-            pdf.set_font('Helvetica', 'B', 7)
-            pdf.set_text_color(255, 0, 0)
-            pdf.cell(0, row_h, 'IF UNABLE TO WORK A SCHEDULED SHIFT YOU MUST FIND A REPLACEMENT', 0, 1, 'C')
-            pdf.set_text_color(0, 0, 0)
-
-            # Events row
-            pdf.set_font('Helvetica', 'B', 8)
-            pdf.set_fill_color(255, 255, 0)
-            pdf.cell(name_col_w, row_h, 'Special Events:', 1, 0, 'L', True)
-            pdf.set_font('Helvetica', '', 8)
-            for events in data['events']:
-                event_text = ', '.join(events) if events else ''
-                pdf.cell(day_col_w, row_h, event_text, 1, 0, 'C', False)
-            pdf.cell(hours_col_w, row_h, '', 1, 1, 'C', False)
+            data = get_schedule_response(week_start)
+
+            output = build_schedule_pdf(data)
 
             # Generate filename
             d1 = data['days'][0]['date'].replace('/', '-')
@@ -1087,10 +1468,6 @@ def register_routes(app):
             year = data['weekTitle'].split(', ')[-1][-2:]
             filename = f"schedule_{d1}-{year}_to_{d2}-{year}.pdf"
 
-            output = BytesIO()
-            pdf.output(output)
-            output.seek(0)
-
             return send_file(
                 output,
                 mimetype='application/pdf',
@@ -1099,7 +1476,7 @@ def register_routes(app):
             )
 
         except Exception as e:
-            logging.error(f"Error exporting PDF: {e}")
+            logging.error("Error exporting PDF: %s", e)
             return jsonify({'error': str(e)}), 400
 
     # -------------------------------------------------------------------------
@@ -1108,69 +1485,42 @@ def register_routes(app):
 
     @app.route('/api/backup/export', methods=['GET'])
     def export_database():
-        """Export entire database to JSON for backup"""
+        """Export entire database to JSON for backup.
+
+        Every table's JSON is built before responding, so a failed query still
+        yields a 400 rather than a truncated 200; the reads share one
+        transaction, giving a consistent snapshot. The finished pieces are then
+        streamed out without joining them into one string.
+        """
         try:
             db = get_db()
             cursor = db.cursor()
-            
-            backup_data = {
-                'export_date': datetime.now().isoformat(),
-                'version': '1.0',
-                'employees': [],
-                'schedules': [],
-                'shifts': [],
-                'office_hours': [],
-                'events': [],
-                'employee_notes': []
-            }
-            
-            # Export employees
-            cursor.execute('SELECT * FROM employees')
-            for row in cursor.fetchall():
-                backup_data['employees'].append(dict(row))
-            
-            # Export schedules
-            cursor.execute('SELECT * FROM schedules')
-            for row in cursor.fetchall():
-                backup_data['schedules'].append(dict(row))
-            
-            # Export shifts
-            cursor.execute('SELECT * FROM shifts')
-            for row in cursor.fetchall():
-                backup_data['shifts'].append(dict(row))
-            
-            # Export office hours
-            cursor.execute('SELECT * FROM office_hours')
-            for row in cursor.fetchall():
-                backup_data['office_hours'].append(dict(row))
-            
-            # Export events
-            cursor.execute('SELECT * FROM events')
-            for row in cursor.fetchall():
-                backup_data['events'].append(dict(row))
-            
-            # Export employee notes
-            cursor.execute('SELECT * FROM employee_notes')
-            for row in cursor.fetchall():
-                backup_data['employee_notes'].append(dict(row))
-            
-            # Create JSON file response
-            import json
-            output = BytesIO()
-            output.write(json.dumps(backup_data, indent=2).encode('utf-8'))
-            output.seek(0)
-            
-            filename = f"schedule_backup_{datetime.now().strftime('%Y-%m-%d_%H%M')}.json"
-            
-            return send_file(
-                output,
+            now = datetime.now()
+            filename = f"schedule_backup_{now.strftime('%Y-%m-%d_%H%M')}.json"
+
+            parts = ['{"export_date": %s, "version": "1.0"' % json.dumps(now.isoformat())]
+            cursor.execute('BEGIN')
+            for table in BACKUP_TABLES:
+                # SQLite's JSON1 builds each table's array in C; Python
+                # only passes the finished text through
+                cursor.execute(f'PRAGMA table_info({table})')
+                pairs = ', '.join(
+                    "'{}', \"{}\"".format(row[1].replace("'", "''"), row[1].replace('"', '""'))
+                    for row in cursor.fetchall()
+                )
+                cursor.execute(f'SELECT json_group_array(json_object({pairs})) FROM {table}')
+                parts.append(', "%s": %s' % (table, cursor.fetchone()[0]))
+            parts.append('}')
+            db.commit()
+
+            return Response(
+                iter(parts),
                 mimetype='application/json',
-                as_attachment=True,
-                download_name=filename
+                headers={'Content-Disposition': f'attachment; filename={filename}'}
             )
         
         except Exception as e:
-            logging.error(f"Error exporting database: {e}")
+            logging.error("Error exporting database: %s", e)
             return jsonify({'error': str(e)}), 400
     
     @app.route('/api/backup/import', methods=['POST'])
@@ -1192,7 +1542,6 @@ def register_routes(app):
             if file.filename == '':
                 return jsonify({'error': 'No file selected'}), 400
             
-            import json
             backup_data = json.load(file)
             
             # Validate backup structure
@@ -1204,6 +1553,15 @@ def register_routes(app):
             db = get_db()
             cursor = db.cursor()
             
+            # Count up front: each table's rows are popped from backup_data and
+            # fed to executemany through a generator, so they can be freed as
+            # soon as that table is written
+            stats = {table: len(backup_data.get(table, [])) for table in BACKUP_TABLES}
+            
+            # Wipe and reload as one transaction: readers keep seeing the old
+            # data until COMMIT, and a bad row rolls the whole restore back
+            cursor.execute('BEGIN IMMEDIATE')
+            
             # Clear existing data (in reverse order of dependencies)
             cursor.execute('DELETE FROM employee_notes')
             cursor.execute('DELETE FROM events')
@@ -1213,73 +1571,78 @@ def register_routes(app):
             cursor.execute('DELETE FROM employees')
             
             # Import employees
-            for emp in backup_data['employees']:
-                cursor.execute('''
-                    INSERT INTO employees (id, name, phone, section, sort_order, active, created_at, updated_at)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (emp['id'], emp['name'], emp.get('phone', ''), emp['section'], 
-                      emp.get('sort_order', 1), emp.get('active', 1),
-                      emp.get('created_at'), emp.get('updated_at')))
+            cursor.executemany('''
+                INSERT INTO employees (id, name, phone, section, sort_order, active, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (
+                (emp['id'], emp['name'], emp.get('phone', ''), emp['section'],
+                 emp.get('sort_order', 1), emp.get('active', 1),
+                 emp.get('created_at'), emp.get('updated_at'))
+                for emp in backup_data.pop('employees')
+            ))
             
             # Import schedules
-            for sched in backup_data['schedules']:
-                cursor.execute('''
-                    INSERT INTO schedules (id, week_start, week_title, created_at, updated_at)
-                    VALUES (?, ?, ?, ?, ?)
-                ''', (sched['id'], sched['week_start'], sched['week_title'],
-                      sched.get('created_at'), sched.get('updated_at')))
+            cursor.executemany('''
+                INSERT INTO schedules (id, week_start, week_title, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (
+                (sched['id'], sched['week_start'], sched['week_title'],
+                 sched.get('created_at'), sched.get('updated_at'))
+                for sched in backup_data.pop('schedules')
+            ))
             
             # Import shifts
-            for shift in backup_data['shifts']:
-                cursor.execute('''
-                    INSERT INTO shifts (id, schedule_id, employee_id, day_index, time_in, time_out)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                ''', (shift['id'], shift['schedule_id'], shift['employee_id'],
-                      shift['day_index'], shift.get('time_in'), shift.get('time_out')))
+            cursor.executemany('''
+                INSERT INTO shifts (id, schedule_id, employee_id, day_index, time_in, time_out)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (
+                (shift['id'], shift['schedule_id'], shift['employee_id'],
+                 shift['day_index'], shift.get('time_in'), shift.get('time_out'))
+                for shift in backup_data.pop('shifts')
+            ))
             
             # Import office hours
-            for oh in backup_data['office_hours']:
-                cursor.execute('''
-                    INSERT INTO office_hours (id, schedule_id, day_index, time_in, time_out)
-                    VALUES (?, ?, ?, ?, ?)
-                ''', (oh['id'], oh['schedule_id'], oh['day_index'],
-                      oh.get('time_in'), oh.get('time_out')))
+            cursor.executemany('''
+                INSERT INTO office_hours (id, schedule_id, day_index, time_in, time_out)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (
+                (oh['id'], oh['schedule_id'], oh['day_index'],
+                 oh.get('time_in'), oh.get('time_out'))
+                for oh in backup_data.pop('office_hours')
+            ))
             
             # Import events
-            for event in backup_data['events']:
-                cursor.execute('''
-                    INSERT INTO events (id, schedule_id, day_index, event_text)
-                    VALUES (?, ?, ?, ?)
-                ''', (event['id'], event['schedule_id'], event['day_index'], event.get('event_text')))
+            cursor.executemany('''
+                INSERT INTO events (id, schedule_id, day_index, event_text)
+                VALUES (?, ?, ?, ?)
+            ''', (
+                (event['id'], event['schedule_id'], event['day_index'], event.get('event_text'))
+                for event in backup_data.pop('events')
+            ))
             
             # Import employee notes (if present)
-            if 'employee_notes' in backup_data:
-                for note in backup_data['employee_notes']:
-                    cursor.execute('''
-                        INSERT INTO employee_notes (id, employee_id, week_start, note, created_at, updated_at)
-                        VALUES (?, ?, ?, ?, ?, ?)
-                    ''', (note['id'], note['employee_id'], note['week_start'],
-                          note.get('note'), note.get('created_at'), note.get('updated_at')))
-            
+            cursor.executemany('''
+                INSERT INTO employee_notes (id, employee_id, week_start, note, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (
+                (note['id'], note['employee_id'], note['week_start'],
+                 note.get('note'), note.get('created_at'), note.get('updated_at'))
+                for note in backup_data.pop('employee_notes', [])
+            ))
+            
+            bump_generation(cursor)
             db.commit()
             
             return jsonify({
                 'success': True,
                 'message': 'Database restored successfully',
-                'stats': {
-                    'employees': len(backup_data['employees']),
-                    'schedules': len(backup_data['schedules']),
-                    'shifts': len(backup_data['shifts']),
-                    'office_hours': len(backup_data['office_hours']),
-                    'events': len(backup_data['events']),
-                    'employee_notes': len(backup_data.get('employee_notes', []))
-                }
+                'stats': stats
             })
         
         except json.JSONDecodeError:
             return jsonify({'error': 'Invalid JSON file'}), 400
         except Exception as e:
-            logging.error(f"Error importing database: {e}")
+            logging.error("Error importing database: %s", e)
             return jsonify({'error': str(e)}), 400
 
 